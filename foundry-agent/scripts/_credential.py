@@ -0,0 +1,56 @@
+"""
+Token credential shared by the skill's scripts.
+
+call_agent.py and check_auth.py both build their credential here, so
+FOUNDRY_CREDENTIAL means the same thing to each of them.
+"""
+
+import os
+
+
+# Token scope used by AIProjectClient, so a probe token is reused by the SDK
+FOUNDRY_SCOPE = "https://ai.azure.com/.default"
+
+
+def credential_mode() -> str:
+    """Return the FOUNDRY_CREDENTIAL mode, normalised ("" when unset)."""
+    return os.environ.get("FOUNDRY_CREDENTIAL", "").strip().lower()
+
+
+def build_credential():
+    """Build the token credential selected by FOUNDRY_CREDENTIAL.
+    
+    "cli" uses the Azure CLI login, "managed" uses a managed identity
+    (AZURE_CLIENT_ID selects a user-assigned one), "env" uses a service
+    principal from AZURE_CLIENT_ID/AZURE_TENANT_ID/AZURE_CLIENT_SECRET and
+    "default" walks the full DefaultAzureCredential chain. When unset, the
+    Azure CLI is tried first and managed identity second.
+    
+    The Azure CLI already persists its tokens; "env" tokens are persisted in
+    the OS keyring so later runs skip the AAD round trip. Set
+    FOUNDRY_TOKEN_CACHE_UNENCRYPTED=1 on headless machines without a keyring.
+    """
+    from azure import identity
+    
+    mode = credential_mode()
+    client_id = os.environ.get("AZURE_CLIENT_ID")
+    
+    if not mode:
+        return identity.ChainedTokenCredential(
+            identity.AzureCliCredential(),
+            identity.ManagedIdentityCredential(client_id=client_id),
+        )
+    if mode == "cli":
+        return identity.AzureCliCredential()
+    if mode == "managed":
+        return identity.ManagedIdentityCredential(client_id=client_id)
+    if mode == "env":
+        return identity.EnvironmentCredential(
+            cache_persistence_options=identity.TokenCachePersistenceOptions(
+                name="foundry-agent",
+                allow_unencrypted_storage=os.environ.get("FOUNDRY_TOKEN_CACHE_UNENCRYPTED") == "1",
+            ),
+        )
+    if mode == "default":
+        return identity.DefaultAzureCredential()
+    raise ValueError(f"Unknown FOUNDRY_CREDENTIAL '{mode}' (use cli, managed, env or default)")
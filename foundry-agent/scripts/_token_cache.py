@@ -0,0 +1,154 @@
+"""
+File-backed access token cache shared between runs of call_agent.py.
+
+Each CLI run is a new process, so the credential's in-memory cache is lost
+between runs. Tokens are kept in ~/.cache/foundry-agent/tokens.json (owner
+read/write only), so back-to-back runs reuse one token until it is about to
+expire. Entries are keyed by scope and by the identity behind the credential:
+FOUNDRY_CREDENTIAL, AZURE_CLIENT_ID, AZURE_TENANT_ID and the Azure CLI's
+current login, so `az login`, `az logout` or a new client id never get an
+old token back. Set FOUNDRY_TOKEN_CACHE=0 to disable.
+"""
+
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from _credential import credential_mode
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory lock, writes are still atomic
+    fcntl = None
+
+
+CACHE_DIR = Path.home() / ".cache" / "foundry-agent"
+TOKENS_FILE = CACHE_DIR / "tokens.json"
+LOCK_FILE = CACHE_DIR / "tokens.lock"
+
+# Treat tokens as expired this many seconds early
+EXPIRY_MARGIN = 60
+
+
+@contextmanager
+def _locked():
+    """Hold an exclusive lock on the cache across sibling processes."""
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        lock = open(LOCK_FILE, "a")
+    except OSError:
+        # Unusable cache directory: reads and writes below fail harmlessly
+        yield
+        return
+    
+    with lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_tokens() -> dict:
+    """Read cached tokens; a missing or corrupt file is an empty cache."""
+    try:
+        tokens = json.loads(TOKENS_FILE.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    return tokens if isinstance(tokens, dict) else {}
+
+
+def _write_tokens(tokens: dict):
+    """Atomically replace the cache file, dropping expired entries."""
+    now = time.time()
+    tokens = {key: entry for key, entry in tokens.items() if entry.get("expires_on", 0) > now}
+    try:
+        with tempfile.NamedTemporaryFile("w", dir=CACHE_DIR, delete=False, encoding='utf-8') as f:
+            json.dump(tokens, f)
+        os.replace(f.name, TOKENS_FILE)
+    except OSError:
+        pass
+
+
+def _is_valid(entry: dict) -> bool:
+    """Check a cached entry is neither near expiry nor past its refresh time."""
+    now = time.time()
+    if now >= entry.get("expires_on", 0) - EXPIRY_MARGIN:
+        return False
+    refresh_on = entry.get("refresh_on")
+    return refresh_on is None or now < refresh_on
+
+
+def _azure_cli_login() -> str:
+    """Identify the Azure CLI's current login by its profile file's mtime and size.
+    
+    az rewrites azureProfile.json on every login, logout and `az account set`.
+    """
+    config_dir = os.environ.get("AZURE_CONFIG_DIR") or os.path.join(Path.home(), ".azure")
+    try:
+        stat = os.stat(os.path.join(config_dir, "azureProfile.json"))
+    except OSError:
+        return ""
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _cache_key(credential, scope: str) -> str:
+    """Build the cache key for a token from the identity that requests it."""
+    return "|".join((
+        type(credential).__name__,
+        credential_mode(),
+        os.environ.get("AZURE_CLIENT_ID", ""),
+        os.environ.get("AZURE_TENANT_ID", ""),
+        _azure_cli_login(),
+        scope,
+    ))
+
+
+def get_or_fetch(credential, scope: str):
+    """Return an AccessToken for scope from the file cache, fetching it on a miss."""
+    if os.environ.get("FOUNDRY_TOKEN_CACHE") == "0":
+        return credential.get_token(scope)
+    
+    from azure.core.credentials import AccessToken
+    
+    key = _cache_key(credential, scope)
+    
+    with _locked():
+        tokens = _read_tokens()
+        entry = tokens.get(key)
+        if entry and _is_valid(entry):
+            return AccessToken(entry["token"], entry["expires_on"])
+        
+        # Fetch while holding the lock so concurrent runs share one AAD round trip
+        token = credential.get_token(scope)
+        tokens[key] = {
+            "token": token.token,
+            "expires_on": token.expires_on,
+            "refresh_on": getattr(token, "refresh_on", None),
+        }
+        _write_tokens(tokens)
+        return token
+
+
+class CachedTokenCredential:
+    """TokenCredential wrapper that serves plain single-scope requests via get_or_fetch()."""
+    
+    def __init__(self, credential):
+        self._credential = credential
+    
+    def get_token(self, *scopes, **kwargs):
+        # Claims challenges, tenant overrides and CAE always go to the credential
+        if len(scopes) == 1 and not any(kwargs.values()):
+            return get_or_fetch(self._credential, scopes[0])
+        return self._credential.get_token(*scopes, **kwargs)
+    
+    def close(self):
+        """Close the wrapped credential."""
+        close = getattr(self._credential, "close", None)
+        if close:
+            close()
@@ -1,43 +1,91 @@
 #!/usr/bin/env python3
 """
 Call an existing Microsoft Foundry agent with a message.
-Uses AzureDefaultCredential for authentication.
+Authenticates with the Azure CLI or a managed identity (see FOUNDRY_CREDENTIAL).
 """
 
 import argparse
+import functools
 import os
+import re
+import site
 import sys
+import time
 from pathlib import Path
 
+from _credential import FOUNDRY_SCOPE, build_credential, credential_mode
+
+
+_SCRIPT_DIR = Path(__file__).parent
+# Where setup.py builds .venv and .env; FOUNDRY_SKILL_DIR moves it for both scripts
+_SKILL_DIR = Path(os.environ.get("FOUNDRY_SKILL_DIR") or _SCRIPT_DIR.parent)
+
+
+def _activate_venv():
+    """Make the skill's .venv packages importable without restarting Python.
+    
+    The venv's site-packages is put on sys.path when it was built for this
+    interpreter's major.minor version. Otherwise its binary wheels may not
+    match, so we fall back to re-executing under the venv's own Python.
+    """
+    venv_dir = _SKILL_DIR / ".venv"
+    venv_python = venv_dir / "bin" / "python"
+    if not venv_python.exists() or Path(sys.prefix).resolve() == venv_dir.resolve():
+        return
+    
+    version = f"python{sys.version_info.major}.{sys.version_info.minor}"
+    venv_site = venv_dir / "lib" / version / "site-packages"
+    if venv_site.is_dir():
+        if str(venv_site) not in sys.path:
+            sys.path.insert(0, str(venv_site))
+            site.addsitedir(str(venv_site))  # process .pth files
+        return
+    
+    os.execv(str(venv_python), [str(venv_python)] + sys.argv)
+
+
+# Candidate .env files, searched in order; the first one found is used
+ENV_LOCATIONS = (
+    _SKILL_DIR.parent / ".env",
+    _SKILL_DIR / ".env",
+    _SCRIPT_DIR / ".env",
+    Path.cwd() / ".env",
+)
+
+# KEY=value, KEY="value" or KEY='value'; unquoted values stop at a '#' comment
+_ENV_RE = re.compile(
+    r"""(?m)^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*(?:"([^"]*)"|'([^']*)'|([^\r\n#]*))"""
+)
+
+
+def _parse_env_file(env_path: Path) -> dict:
+    """Parse KEY=value lines from a .env file, skipping comments and empty values."""
+    values = {}
+    for match in _ENV_RE.finditer(env_path.read_text(encoding='utf-8')):
+        key, double_quoted, single_quoted, bare = match.groups()
+        value = (double_quoted or single_quoted or bare or "").rstrip()
+        if value:
+            values[key] = value
+    return values
+
 
 def load_env_file():
-    """Load .env file from the script's directory or parent."""
-    script_dir = Path(__file__).parent
-    skill_dir = script_dir.parent
-    project_root = skill_dir.parent
+    """Load .env file from the script's directory or parent.
     
-    env_locations = [
-        project_root / ".env",
-        skill_dir / ".env",
-        script_dir / ".env",
-        Path.cwd() / ".env",
-    ]
+    Does nothing when PROJECT_ENDPOINT is already set.
+    """
+    if "PROJECT_ENDPOINT" in os.environ:
+        return None
     
-    for env_path in env_locations:
-        if env_path.exists():
-            try:
-                with open(env_path, encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line and not line.startswith("#") and "=" in line:
-                            key, _, value = line.partition("=")
-                            key = key.strip()
-                            value = value.strip().strip('"').strip("'")
-                            if key and value and key not in os.environ:
-                                os.environ[key] = value
-                return str(env_path)
-            except (IOError, UnicodeDecodeError):
-                continue
+    for env_path in ENV_LOCATIONS:
+        try:
+            # A missing candidate raises FileNotFoundError on open; no separate stat
+            values = _parse_env_file(env_path)
+        except (OSError, UnicodeDecodeError):
+            continue
+        for key, value in values.items():
+            os.environ.setdefault(key, value)
+        return str(env_path)
     return None
 
 
@@ -61,14 +109,72 @@ def check_azure_cli_installed() -> bool:
         return False
 
 
+@functools.lru_cache(maxsize=1)
+def _lazy_imports():
+    """Import the Azure SDK once, on first use, so --help and errors stay fast."""
+    from azure.ai.projects import AIProjectClient
+    
+    return AIProjectClient
+
+
+@functools.lru_cache(maxsize=1)
+def _get_credential():
+    """Return the process-wide credential, backed by the on-disk token cache.
+    
+    Reusing one instance keeps its in-memory cache; the file cache in
+    _token_cache.py also lets back-to-back runs share a token. "env" tokens
+    skip the file cache, since they are already kept in the OS keyring.
+    """
+    from _token_cache import CachedTokenCredential
+    
+    credential = build_credential()
+    if credential_mode() == "env":
+        return credential
+    return CachedTokenCredential(credential)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_project_client():
+    """Return the process-wide AIProjectClient (shares the HTTP connection pool)."""
+    AIProjectClient = _lazy_imports()
+    
+    return AIProjectClient(
+        endpoint=PROJECT_ENDPOINT,
+        credential=_get_credential(),
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _get_openai_client():
+    """Return the OpenAI client for the responses API."""
+    return _get_project_client().get_openai_client()
+
+
+@functools.lru_cache(maxsize=None)
+def _get_agent(agent_name: str):
+    """Fetch an agent definition once per process."""
+    return _get_project_client().agents.get(agent_name=agent_name)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_agent_reference(agent_name: str) -> dict:
+    """Build the responses API extra_body for an agent once per process."""
+    agent = _get_agent(agent_name)
+    return {"agent": {"name": agent.name, "type": "agent_reference"}}
+
+
+def _invoke(openai_client, extra_body: dict, input):
+    """Send one responses.create call with a prebuilt agent reference."""
+    return openai_client.responses.create(input=input, extra_body=extra_body)
+
+
 def check_environment(quiet: bool = False) -> bool:
     """Verify required environment variables are set."""
     global PROJECT_ENDPOINT
     PROJECT_ENDPOINT = os.environ.get("PROJECT_ENDPOINT")
     
     if not PROJECT_ENDPOINT:
-        if not quiet:
-            print("ERROR: PROJECT_ENDPOINT required. Set it or create .env file.", file=sys.stderr)
+        print("ERROR: PROJECT_ENDPOINT required. Set it or create .env file.", file=sys.stderr)
         return False
     
     if _env_file and not quiet:
@@ -77,93 +183,161 @@ def check_environment(quiet: bool = False) -> bool:
 
 
 def check_auth() -> bool:
-    """Quick auth check before making API calls."""
+    """Quick auth check before making API calls (the token stays cached for the SDK)."""
     try:
-        from azure.identity import DefaultAzureCredential
-        credential = DefaultAzureCredential()
-        credential.get_token("https://management.azure.com/.default")
+        credential = _get_credential()
+        credential.get_token(FOUNDRY_SCOPE)
         return True
     except ImportError:
         print("ERROR: Run: pip install azure-ai-projects azure-identity", file=sys.stderr)
         return False
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return False
     except Exception:
-        print("ERROR: Run: az login", file=sys.stderr)
+        # Only diagnose the Azure CLI once the token request has failed
+        if not check_azure_cli_installed():
+            print("ERROR: Azure CLI not found. Install it, then run: az login", file=sys.stderr)
+        else:
+            print("ERROR: Run: az login", file=sys.stderr)
+        return False
+
+
+def _is_auth_error(error: Exception) -> bool:
+    """Check if an exception came from a failed token request."""
+    try:
+        from azure.core.exceptions import ClientAuthenticationError
+    except ImportError:
         return False
+    return isinstance(error, ClientAuthenticationError)
 
 
 def call_agent(message: str, agent_name: str = None) -> str:
     """Call an existing Foundry agent and get a response."""
-    from azure.identity import DefaultAzureCredential
-    from azure.ai.projects import AIProjectClient
-    
     agent_name = agent_name or AGENT_NAME
     
-    project_client = AIProjectClient(
-        endpoint=PROJECT_ENDPOINT,
-        credential=DefaultAzureCredential(),
-    )
-    
-    # Get the existing agent
-    agent = project_client.agents.get(agent_name=agent_name)
-    
-    # Get OpenAI client for responses API
-    openai_client = project_client.get_openai_client()
-    
     # Call the agent using responses.create with agent reference
-    response = openai_client.responses.create(
-        input=message,
-        extra_body={"agent": {"name": agent.name, "type": "agent_reference"}},
-    )
+    response = _invoke(_get_openai_client(), _get_agent_reference(agent_name), message)
     
     return response.output_text
 
 
-def call_agent_streaming(message: str, agent_name: str = None):
-    """Call an existing Foundry agent with streaming response."""
-    from azure.identity import DefaultAzureCredential
-    from azure.ai.projects import AIProjectClient
-    
-    agent_name = agent_name or AGENT_NAME
+def _pump_deltas(stream, deltas):
+    """Feed a stream's text deltas into a queue, then an end marker (or the error)."""
+    try:
+        for event in stream:
+            delta = getattr(event, 'delta', None)
+            if delta:
+                deltas.put(delta)
+    except BaseException as e:
+        deltas.put(e)
+    finally:
+        deltas.put(None)
+
+
+def call_agent_streaming(message: str, agent_name: str = None, min_chunk: int = 64, max_delay: float = 0.05):
+    """Call an existing Foundry agent with streaming response.
     
-    project_client = AIProjectClient(
-        endpoint=PROJECT_ENDPOINT,
-        credential=DefaultAzureCredential(),
-    )
+    Adjacent deltas are joined and yielded once at least min_chunk characters
+    have arrived or max_delay seconds have passed since the last yield. The
+    stream is read on a worker thread, so pending text is yielded on time
+    even while the stream is silent (e.g. during a tool call).
+    """
+    import queue
+    import threading
     
-    # Get the existing agent
-    agent = project_client.agents.get(agent_name=agent_name)
+    agent_name = agent_name or AGENT_NAME
     
-    # Get OpenAI client for responses API
-    openai_client = project_client.get_openai_client()
+    # Get the existing agent reference and OpenAI client for responses API
+    extra_body = _get_agent_reference(agent_name)
+    openai_client = _get_openai_client()
     
     # Call the agent with streaming
-    with openai_client.responses.stream(
-        input=message,
-        extra_body={"agent": {"name": agent.name, "type": "agent_reference"}},
-    ) as stream:
-        for event in stream:
-            if hasattr(event, 'delta') and event.delta:
-                yield event.delta
+    with openai_client.responses.stream(input=message, extra_body=extra_body) as stream:
+        deltas = queue.Queue()
+        threading.Thread(target=_pump_deltas, args=(stream, deltas), daemon=True).start()
+        
+        buf = []
+        buf_len = 0
+        last_yield = time.monotonic()
+        while True:
+            # Only wait past the deadline when nothing is pending
+            timeout = max(0.0, last_yield + max_delay - time.monotonic()) if buf else None
+            try:
+                delta = deltas.get(timeout=timeout)
+            except queue.Empty:
+                delta = ""
+            
+            if isinstance(delta, BaseException):
+                raise delta
+            if delta:
+                buf.append(delta)
+                buf_len += len(delta)
+            
+            now = time.monotonic()
+            if buf and (delta is None or buf_len >= min_chunk or now - last_yield >= max_delay):
+                yield "".join(buf)
+                buf.clear()
+                buf_len = 0
+                last_yield = now
+            if delta is None:
+                break
+
+
+def _read_batch() -> list:
+    """Collect lines for a ::batch request until a blank line or EOF.
+    
+    Ctrl-C cancels the batch and returns no lines.
+    """
+    lines = []
+    while True:
+        try:
+            line = input("batch> ").strip()
+        except KeyboardInterrupt:
+            print("\nBatch cancelled.")
+            return []
+        except EOFError:
+            break
+        if not line:
+            break
+        lines.append(line)
+    return lines
 
 
 def interactive_mode(agent_name: str = None):
-    """Run an interactive conversation with the agent."""
-    from azure.identity import DefaultAzureCredential
-    from azure.ai.projects import AIProjectClient
+    """Run an interactive conversation with the agent.
     
+    '::batch' collects several lines and sends them as one request, and piped
+    (non-tty) stdin is sent as a single batch. Batching gives up per-line
+    replies in exchange for one round trip instead of one per line.
+    """
     agent_name = agent_name or AGENT_NAME
     
-    print(f"Starting interactive session with agent: {agent_name}")
-    print("Type 'exit' or 'quit' to end the session.\n")
+    # Get the existing agent; the reference is reused for every turn
+    extra_body = _get_agent_reference(agent_name)
+    openai_client = _get_openai_client()
     
-    project_client = AIProjectClient(
-        endpoint=PROJECT_ENDPOINT,
-        credential=DefaultAzureCredential(),
-    )
+    # Piped input: one request for the whole batch, up to an 'exit' or 'quit' line
+    if not sys.stdin.isatty():
+        lines = []
+        for line in sys.stdin:
+            line = line.strip()
+            if line.lower() in ('exit', 'quit'):
+                break
+            if line:
+                lines.append(line)
+        if lines:
+            response = _invoke(
+                openai_client,
+                extra_body,
+                [{"role": "user", "content": line} for line in lines],
+            )
+            print(response.output_text)
+        return
     
-    # Get the existing agent
-    agent = project_client.agents.get(agent_name=agent_name)
-    openai_client = project_client.get_openai_client()
+    print(f"Starting interactive session with agent: {agent_name}")
+    print("Type 'exit' or 'quit' to end the session.")
+    print("Type '::batch' to send several lines at once (end with a blank line).\n")
     
     # Maintain conversation history
     conversation = []
@@ -183,13 +357,16 @@ def interactive_mode(agent_name: str = None):
             break
         
         # Add to conversation
-        conversation.append({"role": "user", "content": user_input})
+        if user_input == "::batch":
+            batch = _read_batch()
+            if not batch:
+                continue
+            conversation.extend({"role": "user", "content": line} for line in batch)
+        else:
+            conversation.append({"role": "user", "content": user_input})
         
         # Get response
-        response = openai_client.responses.create(
-            input=conversation,
-            extra_body={"agent": {"name": agent.name, "type": "agent_reference"}},
-        )
+        response = _invoke(openai_client, extra_body, conversation)
         
         # Add assistant response to history
         conversation.append({"role": "assistant", "content": response.output_text})
@@ -198,22 +375,39 @@ def interactive_mode(agent_name: str = None):
 
 
 def list_agents():
-    """List all available agents in the project."""
-    from azure.identity import DefaultAzureCredential
-    from azure.ai.projects import AIProjectClient
+    """List all available agents in the project.
     
-    project_client = AIProjectClient(
-        endpoint=PROJECT_ENDPOINT,
-        credential=DefaultAzureCredential(),
-    )
+    The next page is requested on a worker thread while the current one prints.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    pages = _get_project_client().agents.list(limit=50).by_page()
     
     print(f"Agents in {PROJECT_ENDPOINT}:\n")
-    for agent in project_client.agents.list(limit=50):
-        print(f"  - {agent.name}")
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = pool.submit(next, pages, None)
+        while True:
+            page = pending.result()
+            if page is None:
+                break
+            agents = list(page)
+            pending = pool.submit(next, pages, None)
+            for agent in agents:
+                print(f"  - {agent.name}")
 
 
-def main() -> int:
-    """Main entry point."""
+def _write_stream(chunks):
+    """Write streamed text to stdout, one write and flush per (already coalesced) chunk."""
+    write = sys.stdout.write
+    flush = sys.stdout.flush
+    for chunk in chunks:
+        write(chunk)
+        flush()
+
+
+@functools.cache
+def _build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser once per process."""
     parser = argparse.ArgumentParser(
         description="Call an existing Microsoft Foundry agent",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -223,11 +417,13 @@ Examples:
   python call_agent.py --agent ratemytask "Rate my task: refactor the auth module"
   python call_agent.py --list
   python call_agent.py --interactive
+  cat questions.txt | python call_agent.py --interactive
   python call_agent.py --stream "Tell me about yourself"
 
 Environment Variables:
   PROJECT_ENDPOINT  - Foundry project endpoint (default: shboyer-copilot-proj)
   AGENT_NAME        - Default agent name (default: ratemytask)
+  FOUNDRY_CREDENTIAL - cli, managed, env or default (default: Azure CLI, then managed identity)
         """
     )
     parser.add_argument(
@@ -261,25 +457,21 @@ Environment Variables:
         help="Suppress diagnostic output, only show agent response"
     )
     
-    args = parser.parse_args()
+    return parser
+
+
+def main(argv: list = None) -> int:
+    """Main entry point."""
+    args = _build_parser().parse_args(argv)
     
     # Check environment variables first
     if not check_environment(quiet=args.quiet):
         return 1
     
-    # Check auth (silently if --quiet)
+    # Check auth up front unless --quiet; quiet runs rely on the first SDK call
     if not args.quiet:
         if not check_auth():
             return 1
-    else:
-        # Quick silent auth check
-        try:
-            from azure.identity import DefaultAzureCredential
-            credential = DefaultAzureCredential()
-            credential.get_token("https://management.azure.com/.default")
-        except:
-            print("ERROR: Authentication failed. Run: az login", file=sys.stderr)
-            return 1
     
     try:
         if args.list:
@@ -291,7 +483,7 @@ Environment Variables:
             return 0
         
         if not args.message:
-            print("ERROR: Message is required. Use -h for help.")
+            print("ERROR: Message is required. Use -h for help.", file=sys.stderr)
             return 1
         
         message = " ".join(args.message)
@@ -304,8 +496,7 @@ Environment Variables:
         if args.stream:
             if not args.quiet:
                 print("Response: ", end="", flush=True)
-            for chunk in call_agent_streaming(message, agent_name):
-                print(chunk, end="", flush=True)
+            _write_stream(call_agent_streaming(message, agent_name))
             print()
         else:
             response = call_agent(message, agent_name)
@@ -316,10 +507,17 @@ Environment Variables:
         
         return 0
         
+    except ImportError:
+        print("ERROR: Run: pip install azure-ai-projects azure-identity", file=sys.stderr)
+        return 1
     except Exception as e:
-        print(f"ERROR: {type(e).__name__}: {e}")
+        if _is_auth_error(e):
+            print("ERROR: Authentication failed. Run: az login", file=sys.stderr)
+            return 1
+        print(f"ERROR: {type(e).__name__}: {e}", file=sys.stderr)
         return 1
 
 
 if __name__ == "__main__":
+    _activate_venv()
     sys.exit(main())
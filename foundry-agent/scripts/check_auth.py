@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 """
 Check Azure authentication status and prompt for az login if needed.
-Uses AzureDefaultCredential to verify authentication.
+Uses the same credential as call_agent.py (see FOUNDRY_CREDENTIAL) to verify authentication.
 """
 
 import subprocess
 import sys
 from typing import Tuple
 
+from _credential import FOUNDRY_SCOPE, build_credential
+
 
 def check_azure_cli_installed() -> bool:
     """Check if Azure CLI is installed."""
@@ -27,35 +29,34 @@ def check_azure_cli_logged_in() -> Tuple[bool, str | None]:
     """Check if user is logged in via Azure CLI."""
     try:
         result = subprocess.run(
-            ["az", "account", "show", "--output", "json"],
+            ["az", "account", "show", "--query", "user.name", "--output", "tsv"],
             capture_output=True,
             text=True,
             timeout=30
         )
         if result.returncode == 0:
-            import json
-            account = json.loads(result.stdout)
-            user = account.get("user", {}).get("name", "unknown")
+            user = result.stdout.strip() or "unknown"
             return True, user
         return False, None
-    except (FileNotFoundError, subprocess.TimeoutExpired, json.JSONDecodeError):
+    except (FileNotFoundError, subprocess.TimeoutExpired):
         return False, None
 
 
 def check_default_credential() -> Tuple[bool, str | None]:
-    """Check if AzureDefaultCredential can obtain a token."""
+    """Check if the configured credential can obtain a token."""
     try:
-        from azure.identity import DefaultAzureCredential
         from azure.core.exceptions import ClientAuthenticationError
         
-        credential = DefaultAzureCredential()
-        # Try to get a token for Azure management scope
-        token = credential.get_token("https://management.azure.com/.default")
+        credential = build_credential()
+        # Ask the credential itself: the shared token file cache could hide a logout
+        token = credential.get_token(FOUNDRY_SCOPE)
         return True, "Token obtained successfully"
     except ClientAuthenticationError as e:
         return False, str(e)
     except ImportError:
         return False, "azure-identity not installed. Run: pip install azure-identity"
+    except ValueError as e:
+        return False, str(e)
     except Exception as e:
         return False, f"Unexpected error: {type(e).__name__}: {e}"
 
@@ -83,13 +84,7 @@ def main() -> int:
     """Main entry point."""
     print("Checking Azure authentication status...\n")
     
-    # Check if Azure CLI is installed
-    if not check_azure_cli_installed():
-        print("WARNING: Azure CLI is not installed.")
-        print("Install it from: https://docs.microsoft.com/cli/azure/install-azure-cli")
-        print("\nAttempting to use AzureDefaultCredential anyway...\n")
-    
-    # Check AzureDefaultCredential
+    # Try the credential first; the Azure CLI is only diagnosed on failure
     auth_ok, message = check_default_credential()
     
     if auth_ok:
@@ -98,7 +93,7 @@ def main() -> int:
         if cli_ok:
             print(f"✓ Authenticated as: {user}")
         else:
-            print("✓ Authentication successful via AzureDefaultCredential")
+            print("✓ Authentication successful")
         print("✓ Ready to call Foundry agents")
         return 0
     
@@ -123,7 +118,9 @@ def main() -> int:
                 print("\n✗ Login failed.")
                 return 1
     else:
-        print("\nTo authenticate, install Azure CLI and run: az login")
+        print("\nAzure CLI is not installed.")
+        print("Install it from: https://docs.microsoft.com/cli/azure/install-azure-cli")
+        print("Then run: az login")
     
     return 1
 